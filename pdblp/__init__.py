@@ -1,3 +1,5 @@
 from .pdblp import BCon  # NOQA
 from .pdblp import bopen  # NOQA
+from .pdblp import close_all  # NOQA
+from .cache import FileCache  # NOQA
 from ._version import __version__  # NOQA
@@ -0,0 +1,113 @@
+"""
+This module provides an on disk cache for the DataFrames returned by
+pdblp.BCon so that repeated identical requests do not need to go back to the
+Bloomberg Open API
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+# default number of seconds a cached result is considered fresh for, keyed by
+# the name of the BCon method which produced it
+DEFAULT_TTL = {
+    'bdh': 24 * 60 * 60,
+    'ref': 60 * 60,
+    'bulkref': 24 * 60 * 60,
+    'ref_hist': 24 * 60 * 60,
+    'bulkref_hist': 24 * 60 * 60,
+    'bdib': 60 * 60,
+}
+
+
+def _to_json(obj):
+    # array likes such as numpy arrays and pandas Indexes are represented by
+    # their values since their str() is truncated for large inputs, iterators
+    # are not consumed since the caller still needs them
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    try:
+        it = iter(obj)
+    except TypeError:
+        return str(obj)
+    if it is obj:
+        return str(obj)
+    return list(it)
+
+
+def request_key(method, params):
+    """
+    Create a stable key for a request from the name of the method and its
+    parameters.
+
+    Parameters
+    ----------
+    method: str
+        Name of the BCon method, e.g. "bdh"
+    params: dict
+        Mapping of parameter names to values, list like values which are not
+        JSON serializable, e.g. numpy arrays, are represented by their values
+        and other values by their str()
+    """
+    # parameters are hashed as given rather than sorted since the order of
+    # tickers and fields determines the order of the returned data
+    payload = json.dumps([method, params], sort_keys=True, default=_to_json)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+class FileCache(object):
+    def __init__(self, path='~/.pdblp/cache', ttl=None):
+        """
+        Cache of pandas objects stored as pickle files on disk, one directory
+        per BCon method
+
+        Parameters
+        ----------
+        path: str
+            Directory to store cached results in, created if it does not exist
+        ttl: dict
+            Mapping of BCon method name to number of seconds a cached result
+            stays fresh for, updates DEFAULT_TTL. A ttl of None never expires.
+        """
+        self.path = os.path.expanduser(path)
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+
+    def _file(self, method, key):
+        return os.path.join(self.path, method, key + '.pkl')
+
+    def get(self, method, key):
+        """
+        Return the cached result for key or None if there is no fresh result
+        """
+        fname = self._file(method, key)
+        try:
+            mtime = os.path.getmtime(fname)
+        except OSError:
+            return None
+        ttl = self.ttl.get(method)
+        if ttl is not None and time.time() - mtime > ttl:
+            return None
+        return pd.read_pickle(fname)
+
+    def set(self, method, key, value):
+        """
+        Store value as the cached result for key
+        """
+        fname = self._file(method, key)
+        dirname = os.path.dirname(fname)
+        os.makedirs(dirname, exist_ok=True)
+        # write to a temporary file and rename so concurrent readers never
+        # see a partially written result
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        os.close(fd)
+        try:
+            value.to_pickle(tmp)
+            os.replace(tmp, fname)
+        except BaseException:
+            os.remove(tmp)
+            raise
@@ -7,45 +7,193 @@ representations
 # A huge thank you to Paul McGuire who provided invaluable help working out
 # the grammar for this. Discussion available at
 # https://stackoverflow.com/questions/44144055/parsing-json-like-format-with-pyparsing/44172752#44172752
+#
+# The grammar is implemented below as a hand written recursive descent parser
+# over the line based string representation, roughly
+#
+#   message  := member+
+#   member   := field "=" scalar
+#             | field "=" "{" member* "}"
+#             | field "[]" "=" "{" (scalar ("," scalar)* | object_member*) "}"
+#
+# where object_member is a member of the second form.
 import json
-import pyparsing as pp
-
-
-def _parse(mystr):
-
-    LBRACE, RBRACE, EQUAL = map(pp.Suppress, "{}=")
-    field = pp.Word(pp.printables + ' ', excludeChars='[]=')
-    field.addParseAction(pp.tokenMap(str.rstrip))
-    string = pp.dblQuotedString().setParseAction(pp.removeQuotes)
-    number = pp.pyparsing_common.number()
-    date_expr = pp.Regex(r'\d\d\d\d-\d\d-\d\d')
-    time_expr = pp.Regex(r'\d\d:\d\d:\d\d\.\d\d\d')
-    nan = pp.Keyword('nan')
-    scalar_value = (string | date_expr | time_expr | number | nan)
-
-    list_marker = pp.Suppress("[]")
-    value_list = pp.Forward()
-    jobject = pp.Forward()
-
-    memberDef1 = pp.Group(field + EQUAL + scalar_value)
-    memberDef2 = pp.Group(field + EQUAL + jobject)
-    memberDef3 = pp.Group(field + list_marker + EQUAL + LBRACE + value_list +
-                          RBRACE)
-    memberDef = memberDef1 | memberDef2 | memberDef3
-
-    value_list <<= (pp.delimitedList(scalar_value, ",") |
-                    pp.ZeroOrMore(pp.Group(pp.Dict(memberDef2))))
-    value_list.setParseAction(lambda t: [pp.ParseResults(t[:])])
-
-    members = pp.OneOrMore(memberDef)
-    jobject <<= pp.Dict(LBRACE + pp.ZeroOrMore(memberDef) + RBRACE)
-    # force empty jobject to be a dict
-    jobject.setParseAction(lambda t: t or {})
-
-    parser = members
-    parser = pp.OneOrMore(pp.Group(pp.Dict(memberDef)))
+import re
+
+# compiled once at import since the grammar is input independent
+#
+# _TOKEN classifies every line of the string representation in a single scan
+# of the input, the name of the last matched group gives the kind of the line
+# so that scalars are classified by the regex engine rather than in python.
+# A line is either a closing brace, a comma seperated list of scalars, a
+# member definition whose value is "{" or a scalar, or blank (never matches).
+# An unquoted list of scalars starts like a number or nan and has no "=",
+# otherwise the line is matched as a member definition, e.g. a field name
+# starting with a digit
+_TOKEN = re.compile(r"""
+    ^[ \t]*(?:
+        (?P<close>\})
+      | (?P<values>".*?|(?:[-+.\d]|nan)[^=\n]*?)
+      | (?P<field>[^\[\]=\s][^\[\]=\n]*?)[ \t]*(?P<list>\[\])?[ \t]*=[ \t]*
+        (?:
+            (?P<open>\{)
+          | (?P<string>"(?:[^"\\\n]|\\.)*")
+          | (?P<date>\d\d\d\d-\d\d-\d\d)
+          | (?P<time>\d\d:\d\d:\d\d\.\d\d\d)
+          | (?P<int>[+-]?\d+)
+          | (?P<float>[+-]?(?:\d+\.\d*|\.\d+|\d+(?=[eE]))(?:[eE][+-]?\d+)?)
+          | (?P<nan>nan)
+          | (?P<bad_value>.*?)
+        )
+      | (?P<bad_line>\S.*?)
+    )[ \t\r]*$
+""", re.MULTILINE | re.VERBOSE)
+_SCALAR_LIST = re.compile(r'"(?:[^"\\]|\\.)*"|[^,\s][^,]*')
+_DATE = re.compile(r'\d\d\d\d-\d\d-\d\d$')
+_TIME = re.compile(r'\d\d:\d\d:\d\d\.\d\d\d$')
+
+_CONVERTERS = {
+    "string": lambda value: value[1:-1],
+    "date": str,
+    "time": str,
+    "int": int,
+    "float": float,
+    "nan": str,
+}
+
+
+def _iter_tokens(mystr):
+    # a scalar member is returned as a (field, is_list, value) tuple and a
+    # member whose value is "{" as a (field, is_list) tuple
+    for m in _TOKEN.finditer(mystr):
+        kind = m.lastgroup
+        if kind in _CONVERTERS:
+            is_list = m.group("list") is not None
+            value = _CONVERTERS[kind](m.group(kind))
+            yield "scalar", (m.group("field"), is_list, value)
+        elif kind == "open":
+            is_list = m.group("list") is not None
+            yield "open", (m.group("field"), is_list)
+        elif kind == "close":
+            yield "}", None
+        elif kind == "values":
+            yield "values", m.group("values")
+        elif kind == "bad_value":
+            raise ValueError('Unable to parse value {!r}'
+                             .format(m.group(kind)))
+        else:
+            raise ValueError('Unable to parse line {!r}'.format(m.group(kind)))
+
+
+def _parse_scalar(value):
+    if value.startswith('"') and value.endswith('"') and len(value) > 1:
+        return value[1:-1]
+    if _DATE.match(value):
+        return value
+    if _TIME.match(value):
+        return value
+    if value == "nan":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError('Unable to parse value {!r}'.format(value))
+
+
+def _parse_member(tokens, i):
+    kind, tok = tokens[i]
+    i += 1
+    if kind == "scalar":
+        field, is_list, value = tok
+        if is_list:
+            raise ValueError('Expected "{{" for array {!r}'.format(field))
+        return field, value, i
+    field, is_list = tok
+    if is_list:
+        value, i = _parse_list(tokens, i)
+    else:
+        value, i = _parse_object(tokens, i)
+    return field, value, i
+
+
+def _parse_object(tokens, i):
+    obj = {}
+    while i < len(tokens):
+        kind, tok = tokens[i]
+        if kind == "}":
+            return obj, i + 1
+        if kind == "values":
+            raise ValueError('Unexpected values {!r} in object'.format(tok))
+        field, value, i = _parse_member(tokens, i)
+        obj[field] = value
+    raise ValueError('Missing closing "}"')
+
+
+def _parse_list(tokens, i):
+    values = []
+    while i < len(tokens):
+        kind, tok = tokens[i]
+        if kind == "}":
+            return values, i + 1
+        if kind == "values":
+            for value in _SCALAR_LIST.findall(tok):
+                values.append(_parse_scalar(value.strip()))
+            i += 1
+        else:
+            if kind != "open" or tok[1]:
+                raise ValueError('Unexpected member {!r} in array'
+                                 .format(tok[0]))
+            field, value, i = _parse_member(tokens, i)
+            values.append({field: value})
+    raise ValueError('Missing closing "}"')
+
+
+def _parse_members(tokens):
+    i = 0
+    while i < len(tokens):
+        kind, tok = tokens[i]
+        if kind not in ("scalar", "open"):
+            raise ValueError('Unexpected {!r} at top level'
+                             .format(tok or kind))
+        field, value, i = _parse_member(tokens, i)
+        yield {field: value}
+
+
+def iter_dicts(mystr):
+    """
+    Lazily translate a string representation of a Bloomberg Open API
+    Request/Response into dictionaries, yielding one dictionary per top level
+    element so that only a single element is held in memory at a time.
 
-    return parser.parseString(mystr)
+    Parameters
+    ----------
+    mystr: str
+        A string representation of one or more blpapi.request.Request or
+        blp.message.Message, these should be '\\n' seperated
+    """
+    # the tokens of a top level element are collected until the brace depth
+    # returns to zero and are then parsed independently of the rest
+    tokens = []
+    depth = 0
+    for token in _iter_tokens(mystr):
+        tokens.append(token)
+        kind = token[0]
+        if kind == "open":
+            depth += 1
+        elif kind == "}":
+            depth -= 1
+        if depth <= 0:
+            for d in _parse_members(tokens):
+                yield d
+            tokens = []
+            depth = 0
+    # parse any remaining tokens so an unclosed element raises
+    for d in _parse_members(tokens):
+        yield d
 
 
 def to_dict_list(mystr):
@@ -59,11 +207,7 @@ def to_dict_list(mystr):
         A string representation of one or more blpapi.request.Request or
         blp.message.Message, these should be '\\n' seperated
     """
-    res = _parse(mystr)
-    dicts = []
-    for res_dict in res:
-        dicts.append(res_dict.asDict())
-    return dicts
+    return list(iter_dicts(mystr))
 
 
 def to_json(mystr):
@@ -1,12 +1,50 @@
+import atexit
 import logging
 import contextlib
+import datetime
+import functools
+import inspect
+import itertools
 
 import blpapi
 import numpy as np
 import pandas as pd
 
-
-_RESPONSE_TYPES = [blpapi.Event.RESPONSE, blpapi.Event.PARTIAL_RESPONSE]
+from .cache import request_key
+
+
+_RESPONSE_TYPES = frozenset([blpapi.Event.RESPONSE,
+                             blpapi.Event.PARTIAL_RESPONSE])
+
+# element names resolved once since getElement() and friends otherwise
+# convert a str to a blpapi.Name on every call
+_N_SECURITIES = blpapi.Name('securities')
+_N_FIELDS = blpapi.Name('fields')
+_N_OVERRIDES = blpapi.Name('overrides')
+_N_FIELD_ID = blpapi.Name('fieldId')
+_N_VALUE = blpapi.Name('value')
+_N_DATA_RECORDS = blpapi.Name('DataRecords')
+_N_DATA_FIELDS = blpapi.Name('DataFields')
+_N_STRING_VALUE = blpapi.Name('StringValue')
+_N_SECURITY_DATA = blpapi.Name('securityData')
+_N_SECURITY = blpapi.Name('security')
+_N_SECURITY_ERROR = blpapi.Name('securityError')
+_N_FIELD_EXCEPTIONS = blpapi.Name('fieldExceptions')
+_N_FIELD_DATA = blpapi.Name('fieldData')
+_N_DATE = blpapi.Name('date')
+_N_BAR_DATA = blpapi.Name('barData')
+_N_BAR_TICK_DATA = blpapi.Name('barTickData')
+_N_TIME = blpapi.Name('time')
+_N_OPEN = blpapi.Name('open')
+_N_HIGH = blpapi.Name('high')
+_N_LOW = blpapi.Name('low')
+_N_CLOSE = blpapi.Name('close')
+_N_VOLUME = blpapi.Name('volume')
+_N_NUM_EVENTS = blpapi.Name('numEvents')
+
+# integer CorrelationIds are allocated from a single counter so that they
+# are unique across all BCon objects in the process
+_CID_COUNTER = itertools.count()
 
 # partial lookup table for events used from blpapi.Event
 _EVENT_DICT = {
@@ -20,6 +58,8 @@ _EVENT_DICT = {
 
 
 def _get_logger(debug):
+    # the module logger is shared between BCon instances so this is called on
+    # every use to apply the caller's debug level
     logger = logging.getLogger(__name__)
     if (logger.parent is not None) and logger.parent.hasHandlers() and debug:
         logger.warning('"pdblp.BCon.debug=True" is ignored when user '
@@ -36,16 +76,43 @@ def _get_logger(debug):
     return logger
 
 
+# started BCon objects kept open by bopen(reuse=True), keyed by the keyword
+# arguments they were created with
+_POOL = {}
+
+
 @contextlib.contextmanager
-def bopen(**kwargs):
+def bopen(reuse=False, **kwargs):
     """
     Open and manage a BCon wrapper to a Bloomberg API session
 
     Parameters
     ----------
+    reuse: boolean
+        Whether to keep the session open on exit and reuse it for later
+        calls to bopen(reuse=True) with the same keyword arguments, which
+        avoids starting a new blpapi.Session each time. The keyword argument
+        values must be hashable. Pooled sessions are stopped by close_all(),
+        which is also called at interpreter exit, and a pooled BCon which is
+        stopped is removed from the pool.
     **kwargs:
         Keyword arguments passed into pdblp.BCon initialization
     """
+    if reuse:
+        key = tuple(sorted(kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            raise ValueError('bopen(reuse=True) requires hashable keyword '
+                             'argument values')
+        con = _POOL.get(key)
+        if con is None:
+            con = BCon(**kwargs)
+            con.start()
+            _POOL[key] = con
+        yield con
+        return
+
     con = BCon(**kwargs)
     con.start()
     try:
@@ -54,9 +121,51 @@ def bopen(**kwargs):
         con.stop()
 
 
+def close_all():
+    """
+    Stop all sessions kept open by bopen(reuse=True)
+    """
+    while _POOL:
+        _, con = _POOL.popitem()
+        con.stop()
+
+
+atexit.register(close_all)
+
+
+def _cached(method):
+    # serve results of a BCon method from BCon.cache when one is set, keyed on
+    # the method name and its arguments with defaults applied. The wrapped
+    # method must declare cache and force_refresh parameters, these are
+    # handled here and are not part of the key, cache=False bypasses the
+    # cache for a single call and force_refresh=True queries Bloomberg and
+    # replaces the cached result
+    sig = inspect.signature(method)
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        params = sig.bind(self, *args, **kwargs)
+        params.apply_defaults()
+        params = dict(params.arguments)
+        del params['self']
+        use_cache = params.pop('cache')
+        force_refresh = params.pop('force_refresh')
+        if self.cache is None or not use_cache:
+            return method(self, *args, **kwargs)
+        key = request_key(name, params)
+        res = None if force_refresh else self.cache.get(name, key)
+        if res is None:
+            res = method(self, *args, **kwargs)
+            self.cache.set(name, key, res)
+        return res
+
+    return wrapper
+
+
 class BCon(object):
     def __init__(self, host='localhost', port=8194, debug=False, timeout=500,
-                 session=None, identity=None):
+                 session=None, identity=None, cache=None, chunk_size=100):
         """
         Create an object which manages connection to the Bloomberg API session
 
@@ -80,8 +189,23 @@ class BCon(object):
             Identity to use for request authentication. This should only be
             passed with an appropriate session and should already by
             authenticated. This is only relevant for SAPI and B-Pipe.
+        cache: pdblp.cache.FileCache
+            Cache used to store the results of bdh(), ref(), bulkref(),
+            ref_hist(), bulkref_hist() and bdib() so that identical requests
+            are served without querying Bloomberg, e.g. pdblp.FileCache().
+            By default results are not cached. Each of these methods also
+            accepts cache=False to bypass the cache for a single call and
+            force_refresh=True to replace the cached result.
+        chunk_size: int
+            Maximum number of tickers per request sent to Bloomberg, larger
+            requests are split and the pieces are sent together before any
+            response is read. If None requests are never split.
         """
 
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer or None, '
+                             'not {!r}'.format(chunk_size))
+
         if session is None:
             sessionOptions = blpapi.SessionOptions()
             sessionOptions.setServerHost(host)
@@ -96,6 +220,8 @@ class BCon(object):
         self.timeout = timeout
         self._session = session
         self._identity = identity
+        self.cache = cache
+        self.chunk_size = chunk_size
         # initialize logger
         self.debug = debug
 
@@ -125,17 +251,19 @@ class BCon(object):
         if started:
             ev = self._session.nextEvent()
             ev_name = _EVENT_DICT[ev.eventType()]
-            logger.info('Event Type: {!r}'.format(ev_name))
-            for msg in ev:
-                logger.info('Message Received:\n{}'.format(msg))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('Event Type: {!r}'.format(ev_name))
+                for msg in ev:
+                    logger.info('Message Received:\n{}'.format(msg))
             if ev.eventType() != blpapi.Event.SESSION_STATUS:
                 raise RuntimeError('Expected a "SESSION_STATUS" event but '
                                    'received a {!r}'.format(ev_name))
             ev = self._session.nextEvent()
             ev_name = _EVENT_DICT[ev.eventType()]
-            logger.info('Event Type: {!r}'.format(ev_name))
-            for msg in ev:
-                logger.info('Message Received:\n{}'.format(msg))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info('Event Type: {!r}'.format(ev_name))
+                for msg in ev:
+                    logger.info('Message Received:\n{}'.format(msg))
             if ev.eventType() != blpapi.Event.SESSION_STATUS:
                 raise RuntimeError('Expected a "SESSION_STATUS" event but '
                                    'received a {!r}'.format(ev_name))
@@ -152,93 +280,127 @@ class BCon(object):
         """
         Initialize blpapi.Session services
         """
-        logger = _get_logger(self.debug)
-
-        # flush event queue in defensive way
-        opened = self._session.openService('//blp/refdata')
-        ev = self._session.nextEvent()
-        ev_name = _EVENT_DICT[ev.eventType()]
-        logger.info('Event Type: {!r}'.format(ev_name))
-        for msg in ev:
-            logger.info('Message Received:\n{}'.format(msg))
-        if ev.eventType() != blpapi.Event.SERVICE_STATUS:
-            raise RuntimeError('Expected a "SERVICE_STATUS" event but '
-                               'received a {!r}'.format(ev_name))
-        if not opened:
-            logger.warning('Failed to open //blp/refdata')
-            raise ConnectionError('Could not open a //blp/refdata service')
-        self.refDataService = self._session.getService('//blp/refdata')
+        self.refDataService = self._open_service('//blp/refdata')
+        self.exrService = self._open_service('//blp/exrsvc')
+        return self
 
-        opened = self._session.openService('//blp/exrsvc')
+    def _open_service(self, name):
+        # open a service and return it, checking the SERVICE_STATUS event
+        logger = _get_logger(self.debug)
+        opened = self._session.openService(name)
         ev = self._session.nextEvent()
         ev_name = _EVENT_DICT[ev.eventType()]
-        logger.info('Event Type: {!r}'.format(ev_name))
-        for msg in ev:
-            logger.info('Message Received:\n{}'.format(msg))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Event Type: {!r}'.format(ev_name))
+            for msg in ev:
+                logger.info('Message Received:\n{}'.format(msg))
         if ev.eventType() != blpapi.Event.SERVICE_STATUS:
             raise RuntimeError('Expected a "SERVICE_STATUS" event but '
                                'received a {!r}'.format(ev_name))
         if not opened:
-            logger.warning('Failed to open //blp/exrsvc')
-            raise ConnectionError('Could not open a //blp/exrsvc service')
-        self.exrService = self._session.getService('//blp/exrsvc')
-
-        return self
+            logger.warning('Failed to open {}'.format(name))
+            raise ConnectionError('Could not open a {} service'.format(name))
+        return self._session.getService(name)
 
     def _create_req(self, rtype, tickers, flds, ovrds, setvals):
-        # flush event queue in case previous call errored out
-        while(self._session.tryNextEvent()):
-            pass
-
         request = self.refDataService.createRequest(rtype)
+        securities = request.getElement(_N_SECURITIES)
         for t in tickers:
-            request.getElement('securities').appendValue(t)
+            securities.appendValue(t)
+        fields = request.getElement(_N_FIELDS)
         for f in flds:
-            request.getElement('fields').appendValue(f)
+            fields.appendValue(f)
         for name, val in setvals:
             request.set(name, val)
 
-        overrides = request.getElement('overrides')
+        overrides = request.getElement(_N_OVERRIDES)
         for ovrd_fld, ovrd_val in ovrds:
             ovrd = overrides.appendElement()
-            ovrd.setElement('fieldId', ovrd_fld)
-            ovrd.setElement('value', ovrd_val)
+            ovrd.setElement(_N_FIELD_ID, ovrd_fld)
+            ovrd.setElement(_N_VALUE, ovrd_val)
 
         return request
 
-    def _receive_events(self, sent_events=1, to_dict=True):
+    def _send_chunked(self, rtype, tickers, flds, ovrds, setvals):
+        # split tickers into requests of at most chunk_size and send every
+        # request before reading any responses so they are processed by
+        # Bloomberg concurrently, returns the CorrelationIds in ticker order
+        cids = []
+        for chunk in _chunks(tickers, self.chunk_size):
+            request = self._create_req(rtype, chunk, flds, ovrds, setvals)
+            cids.append(self._send_request(request))
+        return cids
+
+    def _send_request(self, request):
+        # each request is tagged with a CorrelationId allocated from a
+        # module level counter so responses can be routed by id, even between
+        # BCon objects sharing a session, any stale events left over from a
+        # previous call which errored out are then skipped in
+        # _receive_events() rather than flushed before every request
+        logger = _get_logger(self.debug)
+        cid = next(_CID_COUNTER)
+        # formatting a request or message is expensive so only do so when
+        # the message will actually be logged
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Sending Request:\n{}'.format(request))
+        self._session.sendRequest(request, identity=self._identity,
+                                  correlationId=blpapi.CorrelationId(cid))
+        return cid
+
+    def _receive_events(self, cids, to_dict=True):
+        # cids is a collection of the integer CorrelationIds of the requests
+        # sent, events are read until a RESPONSE is received for each
         logger = _get_logger(self.debug)
+        log_info = logger.isEnabledFor(logging.INFO)
+        sent_events = len(cids)
         while True:
             ev = self._session.nextEvent(self.timeout)
-            ev_name = _EVENT_DICT[ev.eventType()]
-            logger.info('Event Type: {!r}'.format(ev_name))
-            if ev.eventType() in _RESPONSE_TYPES:
-                for msg in ev:
-                    logger.info('Message Received:\n{}'.format(msg))
+            ev_type = ev.eventType()
+            if ev_type == blpapi.Event.TIMEOUT:
+                logger.warning('Unexpected Event Type: {!r}'
+                               .format(_EVENT_DICT[ev_type]))
+                raise RuntimeError('Timeout, increase BCon.timeout attribute')
+            msgs = list(ev)
+            # events which do not concern the requests being read are
+            # skipped, e.g. SESSION_STATUS, SERVICE_STATUS or ADMIN events
+            # queued between calls and responses left over from a previous
+            # call which errored out
+            if not any(_is_current(msg, cids) for msg in msgs):
+                if log_info:
+                    logger.info('Discarding {!r} event with CorrelationIds '
+                                '{}'.format(_EVENT_DICT.get(ev_type, ev_type),
+                                            [cid.value() for msg in msgs
+                                             for cid in msg.correlationIds()]))
+                continue
+            if log_info:
+                logger.info('Event Type: {!r}'
+                            .format(_EVENT_DICT.get(ev_type, ev_type)))
+            if ev_type in _RESPONSE_TYPES:
+                for msg in msgs:
+                    if log_info:
+                        logger.info('Message Received:\n{}'.format(msg))
                     if to_dict:
                         yield message_to_dict(msg)
                     else:
                         yield msg
 
-            # deals with multi sends using CorrelationIds
-            if ev.eventType() == blpapi.Event.RESPONSE:
-                sent_events -= 1
-                if sent_events == 0:
-                    break
-            # guard against unknown returned events
-            elif ev.eventType() not in _RESPONSE_TYPES:
+                # deals with multi sends using CorrelationIds
+                if ev_type == blpapi.Event.RESPONSE:
+                    sent_events -= 1
+                    if sent_events == 0:
+                        break
+            # guard against unknown events for the requests being read, e.g.
+            # a REQUEST_STATUS event for a failed request
+            else:
+                ev_name = _EVENT_DICT.get(ev_type, ev_type)
                 logger.warning('Unexpected Event Type: {!r}'.format(ev_name))
-                for msg in ev:
+                for msg in msgs:
                     logger.warning('Message Received:\n{}'.format(msg))
-                if ev.eventType() == blpapi.Event.TIMEOUT:
-                    raise RuntimeError('Timeout, increase BCon.timeout '
-                                       'attribute')
-                else:
-                    raise RuntimeError('Unexpected Event Type: {!r}'
-                                       .format(ev_name))
+                raise RuntimeError('Unexpected Event Type: {!r}'
+                                   .format(ev_name))
 
     def bdh(self, tickers, flds, start_date, end_date, elms=None,
-            ovrds=None, longdata=False):
+            ovrds=None, longdata=False, cache=True, force_refresh=False):
         """
         Get tickers and fields, return pandas DataFrame with columns as
         MultiIndex with levels "ticker" and "field" and indexed by "date".
@@ -265,61 +427,156 @@ class BCon(object):
             field and value
         longdata: boolean
             Whether data should be returned in long data format or pivoted
+        cache: boolean
+            Whether to use BCon.cache for this call if one is set. Results are
+            cached per ticker and field so only pairs which are not cached
+            are requested from Bloomberg.
+        force_refresh: boolean
+            Request all data from Bloomberg and replace any cached results
         """
         ovrds = [] if not ovrds else ovrds
         elms = [] if not elms else elms
 
-        elms = list(elms)
-
-        data = self._bdh_list(tickers, flds, start_date, end_date,
-                              elms, ovrds)
+        if self.cache is not None and cache:
+            data = self._bdh_cached(tickers, flds, start_date, end_date,
+                                    elms, ovrds, force_refresh)
+        else:
+            data = self._bdh_list(tickers, flds, start_date, end_date,
+                                  elms, ovrds)
 
-        df = pd.DataFrame(data, columns=['date', 'ticker', 'field', 'value'])
-        df.loc[:, 'date'] = pd.to_datetime(df.loc[:, 'date'])
         if not longdata:
-            cols = ['ticker', 'field']
-            df = df.set_index(['date'] + cols).unstack(cols)
-            df.columns = df.columns.droplevel(0)
+            return _pivot_hist(data)
 
+        data['date'] = _to_datetime64(data['date'])
+        df = pd.DataFrame(data, columns=['date', 'ticker', 'field', 'value'])
         return df
 
+    def _bdh_cached(self, tickers, flds, start_date, end_date, elms, ovrds,
+                    force_refresh):
+        # historical data is cached per (ticker, field) pair so a request
+        # which overlaps previous ones only queries Bloomberg for the pairs
+        # which are missing, these are fetched with a single request for the
+        # union of their tickers and fields
+        tickers = _as_list(tickers)
+        flds = _as_list(flds)
+        params = {'start_date': start_date, 'end_date': end_date,
+                  'elms': elms, 'ovrds': ovrds}
+        keys = {}
+        pairs = {}
+        for ticker in tickers:
+            for fld in flds:
+                key = request_key('bdh', dict(params, ticker=ticker,
+                                              field=fld))
+                keys[(ticker, fld)] = key
+                if not force_refresh:
+                    pairs[(ticker, fld)] = self.cache.get('bdh', key)
+
+        missing = [pair for pair in keys if pairs.get(pair) is None]
+        if missing:
+            missing_tickers = {t for t, _ in missing}
+            missing_flds = {f for _, f in missing}
+            req_tickers = [t for t in tickers if t in missing_tickers]
+            req_flds = [f for f in flds if f in missing_flds]
+            data = self._bdh_list(req_tickers, req_flds, start_date,
+                                  end_date, elms, ovrds)
+            fresh = {}
+            for dt, ticker, fld, value in zip(data['date'], data['ticker'],
+                                              data['field'], data['value']):
+                dts, vals = fresh.setdefault((ticker, fld), ([], []))
+                dts.append(dt)
+                vals.append(value)
+            for ticker in req_tickers:
+                for fld in req_flds:
+                    dts, vals = fresh.get((ticker, fld), ([], []))
+                    df = pd.DataFrame({'date': dts, 'value': vals},
+                                      columns=['date', 'value'])
+                    self.cache.set('bdh', keys[(ticker, fld)], df)
+                    pairs[(ticker, fld)] = df
+
+        # reassemble in the order Bloomberg returns data, by ticker then date
+        # then field
+        dates = []
+        out_tickers = []
+        fields = []
+        values = []
+        for ticker in tickers:
+            rows = {}
+            for fld in flds:
+                df = pairs[(ticker, fld)]
+                for dt, value in zip(df['date'], df['value']):
+                    rows.setdefault(dt, []).append((fld, value))
+            for dt in sorted(rows):
+                for fld, value in rows[dt]:
+                    dates.append(dt)
+                    out_tickers.append(ticker)
+                    fields.append(fld)
+                    values.append(value)
+        return {'date': dates, 'ticker': out_tickers, 'field': fields,
+                'value': values}
+
     def _bdh_list(self, tickers, flds, start_date, end_date, elms,
                   ovrds):
-        logger = _get_logger(self.debug)
-        if type(tickers) is not list:
-            tickers = [tickers]
-        if type(flds) is not list:
-            flds = [flds]
+        tickers = _as_list(tickers)
+        flds = _as_list(flds)
 
-        setvals = elms
+        # copy rather than alias elms so the caller's list is not mutated
+        setvals = list(elms)
         setvals.append(('startDate', start_date))
         setvals.append(('endDate', end_date))
 
-        request = self._create_req('HistoricalDataRequest', tickers, flds,
-                                   ovrds, setvals)
-        logger.info('Sending Request:\n{}'.format(request))
-        # Send the request
-        self._session.sendRequest(request, identity=self._identity)
-        data = []
-        # Process received events
-        for msg in self._receive_events():
-            d = msg['element']['HistoricalDataResponse']
-            has_security_error = 'securityError' in d['securityData']
-            has_field_exception = len(d['securityData']['fieldExceptions']) > 0
+        cids = self._send_chunked('HistoricalDataRequest', tickers, flds,
+                                  ovrds, setvals)
+        # accumulate columns rather than rows to avoid a tuple per datum and
+        # the row to column transpose when building the DataFrame. Columns are
+        # bucketed by the CorrelationId of the chunk they respond to so the
+        # result is in request order however the responses to different
+        # chunks interleave, see _parse_ref()
+        buckets = {cid: {'date': [], 'ticker': [], 'field': [], 'value': []}
+                   for cid in cids}
+        # Process received events, the Elements of historical data responses
+        # are read directly rather than through message_to_dict() since these
+        # are typically the largest responses and the nested dict per row is
+        # never needed
+        #
+        # element names are converted to str once per call, the date element
+        # maps to None so it is skipped with the same lookup
+        names = {_N_DATE: None}
+        for msg in self._receive_events(cids, to_dict=False):
+            data = buckets[msg.correlationIds()[0].value()]
+            out_dates = data['date']
+            out_tickers = data['ticker']
+            out_fields = data['field']
+            out_values = data['value']
+            secData = msg.getElement(_N_SECURITY_DATA)
+            has_security_error = secData.hasElement(_N_SECURITY_ERROR)
+            fieldExceptions = secData.getElement(_N_FIELD_EXCEPTIONS)
+            has_field_exception = fieldExceptions.numValues() > 0
             if has_security_error or has_field_exception:
+                d = message_to_dict(msg)['element']['HistoricalDataResponse']
                 raise ValueError(d)
-            ticker = d['securityData']['security']
-            fldDatas = d['securityData']['fieldData']
-            for fd in fldDatas:
-                for fname, value in fd['fieldData'].items():
-                    if fname == 'date':
-                        continue
-                    data.append(
-                        (fd['fieldData']['date'], ticker, fname, value)
-                    )
-        return data
-
-    def ref(self, tickers, flds, ovrds=None):
+            ticker = secData.getElementAsString(_N_SECURITY)
+            fldDatas = secData.getElement(_N_FIELD_DATA)
+            for i in range(fldDatas.numValues()):
+                # fields without data are omitted from a row so the field
+                # names can differ between rows
+                fd = fldDatas.getValueAsElement(i)
+                dt = fd.getElementValue(_N_DATE)
+                nvals = 0
+                for elem in fd.elements():
+                    name = elem.name()
+                    try:
+                        fld = names[name]
+                    except KeyError:
+                        fld = names[name] = str(name)
+                    if fld is not None:
+                        out_fields.append(fld)
+                        out_values.append(_element_to_dict(elem))
+                        nvals += 1
+                out_dates.extend(itertools.repeat(dt, nvals))
+                out_tickers.extend(itertools.repeat(ticker, nvals))
+        return _concat_columns([buckets[cid] for cid in cids])
+
+    def ref(self, tickers, flds, ovrds=None, cache=True, force_refresh=False):
         """
         Make a reference data request, get tickers and fields, return long
         pandas DataFrame with columns [ticker, field, value]
@@ -333,6 +590,12 @@ class BCon(object):
         ovrds: list of tuples
             List of tuples where each tuple corresponds to the override
             field and value
+        cache: boolean
+            Whether to use BCon.cache for this call if one is set. Results are
+            cached per ticker and field so only pairs which are not cached
+            are requested from Bloomberg.
+        force_refresh: boolean
+            Request all data from Bloomberg and replace any cached results
 
         Example
         -------
@@ -352,28 +615,70 @@ class BCon(object):
         """
         ovrds = [] if not ovrds else ovrds
 
-        logger = _get_logger(self.debug)
-        if type(tickers) is not list:
-            tickers = [tickers]
-        if type(flds) is not list:
-            flds = [flds]
-        request = self._create_req('ReferenceDataRequest', tickers, flds,
-                                   ovrds, [])
-        logger.info('Sending Request:\n{}'.format(request))
-        self._session.sendRequest(request, identity=self._identity)
-        data = self._parse_ref(flds)
-        data = pd.DataFrame(data)
-        data.columns = ['ticker', 'field', 'value']
+        tickers = _as_list(tickers)
+        flds = _as_list(flds)
+        if self.cache is not None and cache:
+            data = self._ref_cached('ref', self._ref_list, tickers, flds,
+                                    ovrds, force_refresh)
+        else:
+            data = self._ref_list(tickers, flds, ovrds)
+        data = pd.DataFrame(data, columns=['ticker', 'field', 'value'])
         return data
 
-    def _parse_ref(self, flds, keep_corrId=False, sent_events=1):
-        data = []
+    def _ref_list(self, tickers, flds, ovrds):
+        cids = self._send_chunked('ReferenceDataRequest', tickers, flds,
+                                  ovrds, [])
+        buckets = self._parse_ref(flds, cids)
+        return _concat_columns([buckets[cid] for cid in cids])
+
+    def _ref_cached(self, method, request, tickers, flds, ovrds,
+                    force_refresh):
+        # reference data is cached per (ticker, field) pair, see
+        # _bdh_cached(). request(tickers, flds, ovrds) returns the columns of
+        # an uncached request, which contain the rows of every requested pair
+        if not tickers or not flds:
+            return request(tickers, flds, ovrds)
+        keys = {}
+        pairs = {}
+        for ticker in tickers:
+            for fld in flds:
+                key = request_key(method, {'ovrds': ovrds, 'ticker': ticker,
+                                           'field': fld})
+                keys[(ticker, fld)] = key
+                if not force_refresh:
+                    pairs[(ticker, fld)] = self.cache.get(method, key)
+
+        missing = [pair for pair in keys if pairs.get(pair) is None]
+        if missing:
+            missing_tickers = {t for t, _ in missing}
+            missing_flds = {f for _, f in missing}
+            req_tickers = [t for t in tickers if t in missing_tickers]
+            req_flds = [f for f in flds if f in missing_flds]
+            data = request(req_tickers, req_flds, ovrds)
+            rows = {}
+            for i, pair in enumerate(zip(data['ticker'], data['field'])):
+                rows.setdefault(pair, []).append(i)
+            for pair in itertools.product(req_tickers, req_flds):
+                idx = rows.get(pair, [])
+                df = pd.DataFrame({col: [data[col][i] for i in idx]
+                                   for col in data}, columns=list(data))
+                self.cache.set(method, keys[pair], df)
+                pairs[pair] = df
+
+        # reassemble in request order, by ticker then field
+        return _concat_columns([{col: pairs[pair][col].tolist()
+                                 for col in pairs[pair]}
+                                for pair in itertools.product(tickers, flds)])
+
+    def _parse_ref(self, flds, cids):
+        # rows are bucketed by the CorrelationId of the request they respond
+        # to so callers can reassemble them in request order without sorting,
+        # each bucket holds columns rather than rows to avoid a list per datum
+        buckets = {cid: {'ticker': [], 'field': [], 'value': []}
+                   for cid in cids}
         # Process received events
-        for msg in self._receive_events(sent_events):
-            if keep_corrId:
-                corrId = msg['correlationIds']
-            else:
-                corrId = []
+        for msg in self._receive_events(cids):
+            data = buckets[msg['correlationIds'][0]]
             d = msg['element']['ReferenceDataResponse']
             for security_data_dict in d:
                 secData = security_data_dict['securityData']
@@ -382,30 +687,26 @@ class BCon(object):
                     raise ValueError('Unknow security {!r}'.format(ticker))
                 self._check_fieldExceptions(secData['fieldExceptions'])
                 fieldData = secData['fieldData']['fieldData']
-                for fld in flds:
+                # this is a slight hack but if a fieldData response does not
+                # have the element fld and this is not a bad field (which is
+                # checked above) then the assumption is that this is a not
+                # applicable field, thus set NaN
+                # see https://github.com/matthewgilbert/pdblp/issues/13
+                vals = [fieldData.get(fld, np.nan) for fld in flds]
+                for fld, val in zip(flds, vals):
                     # avoid returning nested bbg objects, fail instead
                     # since user should use bulkref()
-                    if (fld in fieldData) and isinstance(fieldData[fld], list):
+                    if isinstance(val, list):
                         raise ValueError('Field {!r} returns bulk reference '
                                          'data which is not supported'
                                          .format(fld))
-                    # this is a slight hack but if a fieldData response
-                    # does not have the element fld and this is not a bad
-                    # field (which is checked above) then the assumption is
-                    # that this is a not applicable field, thus set NaN
-                    # see https://github.com/matthewgilbert/pdblp/issues/13
-                    if fld not in fieldData:
-                        datum = [ticker, fld, np.nan]
-                        datum.extend(corrId)
-                        data.append(datum)
-                    else:
-                        val = fieldData[fld]
-                        datum = [ticker, fld, val]
-                        datum.extend(corrId)
-                        data.append(datum)
-        return data
+                data['ticker'].extend(itertools.repeat(ticker, len(flds)))
+                data['field'].extend(flds)
+                data['value'].extend(vals)
+        return buckets
 
-    def bulkref(self, tickers, flds, ovrds=None):
+    def bulkref(self, tickers, flds, ovrds=None, cache=True,
+                force_refresh=False):
         """
         Make a bulk reference data request, get tickers and fields, return long
         pandas DataFrame with columns [ticker, field, name, value, position].
@@ -421,6 +722,12 @@ class BCon(object):
         ovrds: list of tuples
             List of tuples where each tuple corresponds to the override
             field and value
+        cache: boolean
+            Whether to use BCon.cache for this call if one is set. Results are
+            cached per ticker and field so only pairs which are not cached
+            are requested from Bloomberg.
+        force_refresh: boolean
+            Request all data from Bloomberg and replace any cached results
 
         Example
         -------
@@ -453,29 +760,31 @@ class BCon(object):
         """
         ovrds = [] if not ovrds else ovrds
 
-        logger = _get_logger(self.debug)
-        if type(tickers) is not list:
-            tickers = [tickers]
-        if type(flds) is not list:
-            flds = [flds]
-        setvals = []
-        request = self._create_req('ReferenceDataRequest', tickers, flds,
-                                   ovrds, setvals)
-        logger.info('Sending Request:\n{}'.format(request))
-        self._session.sendRequest(request, identity=self._identity)
-        data = self._parse_bulkref(flds)
-        data = pd.DataFrame(data)
-        data.columns = ['ticker', 'field', 'name', 'value', 'position']
+        tickers = _as_list(tickers)
+        flds = _as_list(flds)
+        if self.cache is not None and cache:
+            data = self._ref_cached('bulkref', self._bulkref_list, tickers,
+                                    flds, ovrds, force_refresh)
+        else:
+            data = self._bulkref_list(tickers, flds, ovrds)
+        data = pd.DataFrame(data, columns=['ticker', 'field', 'name', 'value',
+                                           'position'])
         return data
 
-    def _parse_bulkref(self, flds, keep_corrId=False, sent_events=1):
-        data = []
+    def _bulkref_list(self, tickers, flds, ovrds):
+        cids = self._send_chunked('ReferenceDataRequest', tickers, flds,
+                                  ovrds, [])
+        buckets = self._parse_bulkref(flds, cids)
+        return _concat_columns([buckets[cid] for cid in cids])
+
+    def _parse_bulkref(self, flds, cids):
+        # rows are bucketed by the CorrelationId of the request they respond
+        # to and each bucket holds columns rather than rows, see _parse_ref()
+        buckets = {cid: {'ticker': [], 'field': [], 'name': [], 'value': [],
+                         'position': []} for cid in cids}
         # Process received events
-        for msg in self._receive_events(sent_events):
-            if keep_corrId:
-                corrId = msg['correlationIds']
-            else:
-                corrId = []
+        for msg in self._receive_events(cids):
+            data = buckets[msg['correlationIds'][0]]
             d = msg['element']['ReferenceDataResponse']
             for security_data_dict in d:
                 secData = security_data_dict['securityData']
@@ -485,21 +794,28 @@ class BCon(object):
                 self._check_fieldExceptions(secData['fieldExceptions'])
                 fieldData = secData['fieldData']['fieldData']
                 for fld in flds:
+                    bulk_data = fieldData.get(fld)
+                    if bulk_data is None:
+                        # field is empty or NOT_APPLICABLE_TO_REF_DATA
+                        data['ticker'].append(ticker)
+                        data['field'].append(fld)
+                        data['name'].append(np.nan)
+                        data['value'].append(np.nan)
+                        data['position'].append(np.nan)
+                        continue
                     # fail coherently instead of while parsing downstream
-                    if (fld in fieldData) and not isinstance(fieldData[fld], list): # NOQA
+                    if not isinstance(bulk_data, list):
                         raise ValueError('Cannot parse field {!r} which is '
                                          'not bulk reference data'.format(fld))
-                    elif fld in fieldData:
-                        for i, data_dict in enumerate(fieldData[fld]):
-                            for name, value in data_dict[fld].items():
-                                datum = [ticker, fld, name, value, i]
-                                datum.extend(corrId)
-                                data.append(datum)
-                    else:  # field is empty or NOT_APPLICABLE_TO_REF_DATA
-                        datum = [ticker, fld, np.nan, np.nan, np.nan]
-                        datum.extend(corrId)
-                        data.append(datum)
-        return data
+                    for i, data_dict in enumerate(bulk_data):
+                        row = data_dict[fld]
+                        nvals = len(row)
+                        data['ticker'].extend(itertools.repeat(ticker, nvals))
+                        data['field'].extend(itertools.repeat(fld, nvals))
+                        data['name'].extend(row)
+                        data['value'].extend(row.values())
+                        data['position'].extend(itertools.repeat(i, nvals))
+        return buckets
 
     @staticmethod
     def _check_fieldExceptions(field_exceptions):
@@ -510,8 +826,9 @@ class BCon(object):
             if fe['errorInfo']['errorInfo']['subcategory'] == 'INVALID_FIELD':
                 raise ValueError('{}: INVALID_FIELD'.format(fe['fieldId']))
 
+    @_cached
     def ref_hist(self, tickers, flds, dates, ovrds=None,
-                 date_field='REFERENCE_DATE'):
+                 date_field='REFERENCE_DATE', cache=True, force_refresh=False):
         """
         Make iterative calls to ref() and create a long DataFrame with columns
         [date, ticker, field, value] where each date corresponds to overriding
@@ -532,6 +849,10 @@ class BCon(object):
         date_field: str
             Field to iteratively override for requesting historical data,
             e.g. REFERENCE_DATE, CURVE_DATE, etc.
+        cache: boolean
+            Whether to use BCon.cache for this call if one is set
+        force_refresh: boolean
+            Request the data from Bloomberg and replace any cached result
 
         Example
         -------
@@ -544,22 +865,29 @@ class BCon(object):
         """
         ovrds = [] if not ovrds else ovrds
 
-        if type(tickers) is not list:
-            tickers = [tickers]
-        if type(flds) is not list:
-            flds = [flds]
-
-        self._send_hist(tickers, flds, dates, date_field, ovrds)
-
-        data = self._parse_ref(flds, keep_corrId=True, sent_events=len(dates))
-        data = pd.DataFrame(data)
-        data.columns = ['ticker', 'field', 'value', 'date']
-        data = data.sort_values(by='date').reset_index(drop=True)
-        data = data.loc[:, ['date', 'ticker', 'field', 'value']]
+        tickers = _as_list(tickers)
+        flds = _as_list(flds)
+
+        cid_to_date = self._send_hist(tickers, flds, dates, date_field, ovrds)
+
+        buckets = self._parse_ref(flds, cid_to_date)
+        # emit the buckets in date order, this sorts the requested dates
+        # rather than every returned row
+        data = {'date': [], 'ticker': [], 'field': [], 'value': []}
+        for cid in sorted(cid_to_date, key=cid_to_date.get):
+            bucket = buckets[cid]
+            nvals = len(bucket['value'])
+            data['date'].extend(itertools.repeat(cid_to_date[cid], nvals))
+            data['ticker'].extend(bucket['ticker'])
+            data['field'].extend(bucket['field'])
+            data['value'].extend(bucket['value'])
+        data = pd.DataFrame(data, columns=['date', 'ticker', 'field', 'value'])
         return data
 
+    @_cached
     def bulkref_hist(self, tickers, flds, dates, ovrds=None,
-                     date_field='REFERENCE_DATE'):
+                     date_field='REFERENCE_DATE', cache=True,
+                     force_refresh=False):
         """
         Make iterative calls to bulkref() and create a long DataFrame with
         columns [date, ticker, field, name, value, position] where each date
@@ -580,6 +908,10 @@ class BCon(object):
         date_field: str
             Field to iteratively override for requesting historical data,
             e.g. REFERENCE_DATE, CURVE_DATE, etc.
+        cache: boolean
+            Whether to use BCon.cache for this call if one is set
+        force_refresh: boolean
+            Request the data from Bloomberg and replace any cached result
 
         Example
         -------
@@ -593,42 +925,49 @@ class BCon(object):
         """
         ovrds = [] if not ovrds else ovrds
 
-        if type(tickers) is not list:
-            tickers = [tickers]
-        if type(flds) is not list:
-            flds = [flds]
-        self._send_hist(tickers, flds, dates, date_field, ovrds)
-        data = self._parse_bulkref(flds, keep_corrId=True,
-                                   sent_events=len(dates))
-        data = pd.DataFrame(data)
-        data.columns = ['ticker', 'field', 'name', 'value', 'position', 'date']
+        tickers = _as_list(tickers)
+        flds = _as_list(flds)
+        cid_to_date = self._send_hist(tickers, flds, dates, date_field, ovrds)
+        buckets = self._parse_bulkref(flds, cid_to_date)
+        cols = ['date', 'ticker', 'field', 'name', 'value', 'position']
+        data = {col: [] for col in cols}
+        for cid, bucket in buckets.items():
+            nvals = len(bucket['value'])
+            data['date'].extend(itertools.repeat(cid_to_date[cid], nvals))
+            for col in cols[1:]:
+                data[col].extend(bucket[col])
+        data = pd.DataFrame(data, columns=cols)
         data = data.sort_values(by=['date', 'position']).reset_index(drop=True)
-        data = data.loc[:, ['date', 'ticker', 'field', 'name',
-                            'value', 'position']]
         return data
 
     def _send_hist(self, tickers, flds, dates, date_field, ovrds):
-        logger = _get_logger(self.debug)
-        setvals = []
-        request = self._create_req('ReferenceDataRequest', tickers, flds,
-                                   ovrds, setvals)
-
-        overrides = request.getElement('overrides')
         if len(dates) == 0:
             raise ValueError('dates must by non empty')
-        ovrd = overrides.appendElement()
-        for dt in dates:
-            ovrd.setElement('fieldId', date_field)
-            ovrd.setElement('value', dt)
-            # CorrelationID used to keep track of which response coincides with
-            # which request
-            cid = blpapi.CorrelationId(dt)
-            logger.info('Sending Request:\n{}'.format(request))
-            self._session.sendRequest(request, identity=self._identity,
-                                      correlationId=cid)
-
+        setvals = []
+        # CorrelationIDs used to keep track of which response coincides with
+        # which request, every (chunk of tickers, date) request is sent before
+        # any response is read so they are processed by Bloomberg together
+        cid_to_date = {}
+        for chunk in _chunks(tickers, self.chunk_size):
+            request = self._create_req('ReferenceDataRequest', chunk, flds,
+                                       ovrds, setvals)
+
+            # a single request is reused for all dates, this is safe since
+            # sendRequest() serializes the request when it is called so
+            # mutating the date override afterwards does not affect requests
+            # already sent
+            overrides = request.getElement(_N_OVERRIDES)
+            ovrd = overrides.appendElement()
+            ovrd.setElement(_N_FIELD_ID, date_field)
+            for dt in dates:
+                ovrd.setElement(_N_VALUE, dt)
+                cid = self._send_request(request)
+                cid_to_date[cid] = dt
+        return cid_to_date
+
+    @_cached
     def bdib(self, ticker, start_datetime, end_datetime, event_type, interval,
-             elms=None):
+             elms=None, cache=True, force_refresh=False):
         """
         Get Open, High, Low, Close, Volume, and numEvents for a ticker.
         Return pandas DataFrame
@@ -650,14 +989,13 @@ class BCon(object):
             List of tuples where each tuple corresponds to the other elements
             to be set. Refer to the IntradayBarRequest section in the
             'Services & schemas reference guide' for more info on these values
+        cache: boolean
+            Whether to use BCon.cache for this call if one is set
+        force_refresh: boolean
+            Request the data from Bloomberg and replace any cached result
         """
         elms = [] if not elms else elms
 
-        # flush event queue in case previous call errored out
-        logger = _get_logger(self.debug)
-        while(self._session.tryNextEvent()):
-            pass
-
         # Create and fill the request for the historical data
         request = self.refDataService.createRequest('IntradayBarRequest')
         request.set('security', ticker)
@@ -668,17 +1006,25 @@ class BCon(object):
         for name, val in elms:
             request.set(name, val)
 
-        logger.info('Sending Request:\n{}'.format(request))
-        # Send the request
-        self._session.sendRequest(request, identity=self._identity)
+        cid = self._send_request(request)
         # Process received events
-        data = []
+        # accumulate columns rather than a dict per bar to avoid the row to
+        # column transpose when building the DataFrame, the bar Elements are
+        # read directly rather than converted with message_to_dict() first
         flds = ['open', 'high', 'low', 'close', 'volume', 'numEvents']
-        for msg in self._receive_events():
-            d = msg['element']['IntradayBarResponse']
-            for bar in d['barData']['barTickData']:
-                data.append(bar['barTickData'])
-        data = pd.DataFrame(data).set_index('time').sort_index().loc[:, flds]
+        names = [_N_OPEN, _N_HIGH, _N_LOW, _N_CLOSE, _N_VOLUME, _N_NUM_EVENTS]
+        times = []
+        data = {fld: [] for fld in flds}
+        columns = [(name, data[fld]) for name, fld in zip(names, flds)]
+        for msg in self._receive_events([cid], to_dict=False):
+            bars = msg.getElement(_N_BAR_DATA).getElement(_N_BAR_TICK_DATA)
+            for i in range(bars.numValues()):
+                bar = bars.getValueAsElement(i)
+                times.append(bar.getElementValue(_N_TIME))
+                for name, column in columns:
+                    column.append(bar.getElementValue(name))
+        index = pd.DatetimeIndex(times, name='time')
+        data = pd.DataFrame(data, index=index, columns=flds).sort_index()
         return data
 
     def bsrch(self, domain):
@@ -699,25 +1045,92 @@ class BCon(object):
         data: pandas.DataFrame
             List of bloomberg tickers from the BSRCH
         """
-        logger = _get_logger(self.debug)
         request = self.exrService.createRequest('ExcelGetGridRequest')
         request.set('Domain', domain)
-        logger.info('Sending Request:\n{}'.format(request))
-        self._session.sendRequest(request, identity=self._identity)
+        cid = self._send_request(request)
         data = []
-        for msg in self._receive_events(to_dict=False):
-            for v in msg.getElement("DataRecords").values():
-                for f in v.getElement("DataFields").values():
-                    data.append(f.getElementAsString("StringValue"))
+        for msg in self._receive_events([cid], to_dict=False):
+            # index into the arrays rather than using values() to avoid
+            # creating a Python iterator per record
+            records = msg.getElement(_N_DATA_RECORDS)
+            for i in range(records.numValues()):
+                record = records.getValueAsElement(i)
+                fields = record.getElement(_N_DATA_FIELDS)
+                for j in range(fields.numValues()):
+                    f = fields.getValueAsElement(j)
+                    data.append(f.getElementAsString(_N_STRING_VALUE))
         return pd.DataFrame(data)
 
     def stop(self):
         """
         Close the blp session
         """
+        # a stopped BCon must not be handed out again by bopen(reuse=True)
+        for key, con in list(_POOL.items()):
+            if con is self:
+                del _POOL[key]
         self._session.stop()
 
 
+def _as_list(x):
+    # a single str is wrapped, any other iterable (list, tuple, np.ndarray,
+    # generator, etc.) is converted to a list
+    if isinstance(x, str):
+        return [x]
+    return list(x)
+
+
+def _concat_columns(buckets):
+    # concatenate a list of dicts mapping column names to lists of values
+    data = {col: [] for col in buckets[0]}
+    for bucket in buckets:
+        for col, values in bucket.items():
+            data[col].extend(values)
+    return data
+
+
+def _chunks(seq, size):
+    # split seq into lists of at most size elements, size of None means no
+    # splitting, an empty seq still gives a single (empty) chunk so that a
+    # request is always sent
+    if size is None:
+        return [seq]
+    return [seq[i:i + size] for i in range(0, max(len(seq), 1), size)]
+
+
+def _is_current(msg, cids):
+    # whether a message is tagged with one of the CorrelationIds being read
+    return any(cid.value() in cids for cid in msg.correlationIds())
+
+
+def _to_datetime64(dates):
+    # blpapi returns datetime.date objects for dates which can be cast
+    # directly instead of going through the generic parsing in to_datetime
+    if dates and type(dates[0]) is datetime.date:
+        dates = np.array(dates, dtype='datetime64[D]')
+        return dates.astype('datetime64[ns]')
+    return pd.to_datetime(dates, cache=True)
+
+
+def _pivot_hist(data):
+    # build the wide DataFrame directly from the historical data columns,
+    # equivalent to set_index(['date', 'ticker', 'field']).unstack() but
+    # without materializing the long DataFrame and reshaping it
+    columns = {}
+    for dt, ticker, fld, value in zip(data['date'], data['ticker'],
+                                      data['field'], data['value']):
+        columns.setdefault((ticker, fld), {})[dt] = value
+    if not columns:
+        index = pd.DatetimeIndex([], name='date')
+        cols = pd.MultiIndex.from_tuples([], names=['ticker', 'field'])
+        return pd.DataFrame(index=index, columns=cols)
+
+    df = pd.DataFrame(columns).sort_index()
+    df.index = pd.DatetimeIndex(_to_datetime64(list(df.index)), name='date')
+    df.columns.names = ['ticker', 'field']
+    return df
+
+
 def _element_to_dict(elem):
     if isinstance(elem, str):
         return elem
@@ -0,0 +1,225 @@
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from pdblp import cache
+from pdblp import pdblp
+
+
+def test_request_key_stable():
+    key1 = cache.request_key('bdh', {'tickers': ['SPY US Equity'],
+                                     'flds': ['PX_LAST'], 'elms': None})
+    key2 = cache.request_key('bdh', {'elms': None, 'flds': ['PX_LAST'],
+                                     'tickers': ['SPY US Equity']})
+    assert key1 == key2
+
+
+def test_request_key_differs():
+    params = {'tickers': ['SPY US Equity'], 'flds': ['PX_LAST']}
+    assert cache.request_key('bdh', params) != cache.request_key('ref', params)
+    params2 = {'tickers': ['SPY US Equity'], 'flds': ['PX_OPEN']}
+    assert cache.request_key('bdh', params) != cache.request_key('bdh',
+                                                                 params2)
+
+
+def test_request_key_array_likes():
+    tickers = np.array(['T{} Equity'.format(i) for i in range(2000)])
+    tickers2 = tickers.copy()
+    tickers2[1000] = 'OTHER Equity'
+    assert (cache.request_key('ref', {'tickers': tickers}) !=
+            cache.request_key('ref', {'tickers': tickers2}))
+    assert (cache.request_key('ref', {'tickers': tickers}) ==
+            cache.request_key('ref', {'tickers': list(tickers)}))
+
+    dates = pd.date_range('20150101', periods=300).strftime('%Y%m%d')
+    dates2 = dates.tolist()
+    dates2[150] = '20200101'
+    assert (cache.request_key('ref_hist', {'dates': dates}) !=
+            cache.request_key('ref_hist', {'dates': pd.Index(dates2)}))
+
+
+def test_file_cache_roundtrip(tmpdir):
+    fcache = cache.FileCache(str(tmpdir))
+    df = pd.DataFrame({'ticker': ['SPY US Equity'], 'value': [205.42]})
+    assert fcache.get('ref', 'abc') is None
+    fcache.set('ref', 'abc', df)
+    assert_frame_equal(fcache.get('ref', 'abc'), df)
+    assert fcache.get('bdh', 'abc') is None
+
+
+def test_file_cache_expired(tmpdir):
+    fcache = cache.FileCache(str(tmpdir), ttl={'ref': 60})
+    df = pd.DataFrame({'value': [1.0]})
+    fcache.set('ref', 'abc', df)
+    fname = os.path.join(str(tmpdir), 'ref', 'abc.pkl')
+    old = time.time() - 120
+    os.utime(fname, (old, old))
+    assert fcache.get('ref', 'abc') is None
+
+
+def test_file_cache_no_expiry(tmpdir):
+    fcache = cache.FileCache(str(tmpdir), ttl={'ref': None})
+    df = pd.DataFrame({'value': [1.0]})
+    fcache.set('ref', 'abc', df)
+    fname = os.path.join(str(tmpdir), 'ref', 'abc.pkl')
+    old = time.time() - 10 ** 6
+    os.utime(fname, (old, old))
+    assert_frame_equal(fcache.get('ref', 'abc'), df)
+
+
+HIST = {
+    'A US Equity': [(datetime.date(2015, 6, 29), {'PX_LAST': 1.0,
+                                                  'VOLUME': 10.0}),
+                    (datetime.date(2015, 6, 30), {'PX_LAST': 2.0})],
+    'B US Equity': [(datetime.date(2015, 6, 29), {'PX_LAST': 3.0}),
+                    (datetime.date(2015, 6, 30), {'VOLUME': 20.0})],
+}
+
+REF = {
+    'A US Equity': {'NAME': 'A', 'PX_LAST': 1.0},
+    'B US Equity': {'NAME': 'B'},
+}
+
+
+@pytest.fixture
+def con(tmpdir):
+    # a BCon which is never started, requests are answered by the stubs
+    # below which record the tickers and fields asked for
+    con = pdblp.BCon.__new__(pdblp.BCon)
+    con.cache = cache.FileCache(str(tmpdir))
+    con.calls = []
+
+    def bdh_list(tickers, flds, start_date, end_date, elms, ovrds):
+        con.calls.append((tickers, flds))
+        data = {'date': [], 'ticker': [], 'field': [], 'value': []}
+        for ticker in tickers:
+            for dt, row in HIST[ticker]:
+                for fld in flds:
+                    if fld in row:
+                        data['date'].append(dt)
+                        data['ticker'].append(ticker)
+                        data['field'].append(fld)
+                        data['value'].append(row[fld])
+        return data
+
+    def ref_list(tickers, flds, ovrds):
+        con.calls.append((tickers, flds))
+        data = {'ticker': [], 'field': [], 'value': []}
+        for ticker in tickers:
+            for fld in flds:
+                data['ticker'].append(ticker)
+                data['field'].append(fld)
+                data['value'].append(REF[ticker].get(fld, np.nan))
+        return data
+
+    def send_hist(tickers, flds, dates, date_field, ovrds):
+        con.calls.append((tickers, flds))
+        return {cid: dt for cid, dt in enumerate(dates)}
+
+    def parse_ref(flds, cids):
+        return {cid: {'ticker': ['A US Equity'], 'field': flds[:1],
+                      'value': ['A']} for cid in cids}
+
+    def parse_bulkref(flds, cids):
+        return {cid: {'ticker': ['A US Equity'], 'field': flds[:1],
+                      'name': ['Member'], 'value': ['B'], 'position': [0]}
+                for cid in cids}
+
+    class Request(object):
+        def set(self, name, value):
+            pass
+
+    class Service(object):
+        def createRequest(self, rtype):
+            return Request()
+
+    def send_request(request):
+        con.calls.append(request)
+        return len(con.calls)
+
+    def receive_events(cids, to_dict=True):
+        return iter([])
+
+    con._bdh_list = bdh_list
+    con._ref_list = ref_list
+    con._send_hist = send_hist
+    con._parse_ref = parse_ref
+    con._parse_bulkref = parse_bulkref
+    con.refDataService = Service()
+    con._send_request = send_request
+    con._receive_events = receive_events
+    return con
+
+
+@pytest.mark.parametrize('longdata', [False, True])
+def test_bdh_partial_cache(con, longdata):
+    tickers = ['A US Equity', 'B US Equity']
+    flds = ['PX_LAST', 'VOLUME']
+    args = ('20150629', '20150630')
+
+    con.bdh(tickers[:1], flds, *args, longdata=longdata)
+    assert con.calls == [(tickers[:1], flds)]
+    df = con.bdh(tickers, flds, *args, longdata=longdata)
+    assert con.calls[-1] == (tickers[1:], flds)
+    df_expect = con.bdh(tickers, flds, *args, longdata=longdata, cache=False)
+    assert_frame_equal(df, df_expect)
+
+    ncalls = len(con.calls)
+    df = con.bdh(tickers, flds, *args, longdata=longdata)
+    assert len(con.calls) == ncalls
+    assert_frame_equal(df, df_expect)
+
+    con.bdh(tickers, flds, *args, longdata=longdata, force_refresh=True)
+    assert con.calls[-1] == (tickers, flds)
+
+
+def test_ref_partial_cache(con):
+    tickers = ['A US Equity', 'B US Equity']
+    flds = ['NAME', 'PX_LAST']
+
+    con.ref(tickers, flds[:1])
+    assert con.calls == [(tickers, flds[:1])]
+    df = con.ref(tickers, flds)
+    assert con.calls[-1] == (tickers, flds[1:])
+    df_expect = con.ref(tickers, flds, cache=False)
+    assert_frame_equal(df, df_expect)
+
+    ncalls = len(con.calls)
+    df = con.ref(tickers[::-1], flds[::-1])
+    assert len(con.calls) == ncalls
+    assert_frame_equal(df, con.ref(tickers[::-1], flds[::-1], cache=False))
+
+    con.ref(tickers, flds, force_refresh=True)
+    assert con.calls[-1] == (tickers, flds)
+
+
+@pytest.mark.parametrize('method, args, defaults', [
+    ('ref_hist', (['A US Equity'], ['NAME'], ['20150629']),
+     (None, 'REFERENCE_DATE')),
+    ('bulkref_hist', (['A US Equity'], ['INDX_MWEIGHT'], ['20150629']),
+     (None, 'REFERENCE_DATE')),
+    ('bdib', ('A US Equity', '2015-06-29T10:00:00', '2015-06-29T11:00:00',
+              'TRADE', 1), (None,)),
+])
+def test_cached_methods(con, method, args, defaults):
+    func = getattr(con, method)
+    df = func(*args)
+    assert len(con.calls) == 1
+    assert_frame_equal(func(*args), df)
+    assert len(con.calls) == 1
+
+    func(*args, cache=False)
+    assert len(con.calls) == 2
+    func(*(args + defaults + (False,)))
+    assert len(con.calls) == 3
+    func(*args, force_refresh=True)
+    assert len(con.calls) == 4
+    func(*(args + defaults + (True, True)))
+    assert len(con.calls) == 5
+    assert_frame_equal(func(*args), df)
+    assert len(con.calls) == 5
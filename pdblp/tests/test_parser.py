@@ -787,3 +787,56 @@ def test_grid_response():
                  }
                 }]
     assert res == exp_res
+
+
+def test_iter_dicts_two_requests():
+    test_str = """
+    HistoricalDataRequest = {
+        securities[] = {
+            "SPY US Equity"
+        }
+    }
+
+    HistoricalDataRequest = {
+    }
+    """
+    res = parser.iter_dicts(test_str)
+    assert next(res) == {"HistoricalDataRequest":
+                         {"securities": ["SPY US Equity"]}}
+    assert next(res) == {"HistoricalDataRequest": {}}
+    with pytest.raises(StopIteration):
+        next(res)
+
+
+def test_string_value_brace():
+    test_str = """
+    ReferenceDataResponse = {
+        NAME = "{"
+    }
+    """
+    res = parser.to_dict_list(test_str)
+    exp_res = [{"ReferenceDataResponse": {"NAME": "{"}}]
+    assert res == exp_res
+
+
+def test_scalar_arrays():
+    test_str = """
+    A = {
+        ints[] = {
+            1, 2, 3
+        }
+        dates[] = {
+            2018-01-02, 2018-01-03
+        }
+        floats[] = {
+            1.5, nan, -2.0
+        }
+        30DAY_VOL = 1.5
+    }
+    """
+    res = parser.to_dict_list(test_str)
+    exp_res = [{"A": {"ints": [1, 2, 3],
+                      "dates": ["2018-01-02", "2018-01-03"],
+                      "floats": [1.5, "nan", -2.0],
+                      "30DAY_VOL": 1.5}}]
+    assert res == exp_res
@@ -159,6 +159,91 @@ def test_bdh_one_ticker_one_field_pivoted(con):
     assert_frame_equal(df, df_expect)
 
 
+@ifbbg
+def test_bdh_chunked(con, host, port, timeout):
+    con_chunked = pdblp.BCon(host=host, port=port, timeout=timeout,
+                             chunk_size=1).start()
+    tickers = ['SPY US Equity', 'IBM US Equity']
+    flds = ['PX_LAST', 'VOLUME']
+    for longdata in [False, True]:
+        df = con_chunked.bdh(tickers, flds, '20150629', '20150630',
+                             longdata=longdata)
+        df_expect = con.bdh(tickers, flds, '20150629', '20150630',
+                            longdata=longdata)
+        assert_frame_equal(df, df_expect)
+    con_chunked.stop()
+
+
+def test_chunk_size_invalid():
+    with pytest.raises(ValueError):
+        pdblp.BCon(chunk_size=0)
+
+
+class StubMessage(object):
+    def __init__(self, cids):
+        self._cids = [blpapi.CorrelationId(cid) for cid in cids]
+
+    def correlationIds(self):
+        return self._cids
+
+
+class StubEvent(object):
+    def __init__(self, event_type, msgs=()):
+        self._event_type = event_type
+        self._msgs = list(msgs)
+
+    def eventType(self):
+        return self._event_type
+
+    def __iter__(self):
+        return iter(self._msgs)
+
+
+class StubSession(object):
+    # returns queued events in order and TIMEOUT once they are exhausted
+    def __init__(self, events):
+        self.events = list(events)
+
+    def nextEvent(self, timeout=0):
+        if self.events:
+            return self.events.pop(0)
+        return StubEvent(blpapi.Event.TIMEOUT)
+
+
+def stub_con(events):
+    con = pdblp.BCon.__new__(pdblp.BCon)
+    con.debug = False
+    con.timeout = 0
+    con._session = StubSession(events)
+    return con
+
+
+def test_receive_events_skips_uncorrelated_events():
+    response = StubMessage([1])
+    events = [StubEvent(blpapi.Event.SESSION_STATUS, [StubMessage([])]),
+              StubEvent(blpapi.Event.SERVICE_STATUS, [StubMessage([])]),
+              StubEvent(blpapi.Event.ADMIN, [StubMessage([])]),
+              StubEvent(blpapi.Event.RESPONSE, [StubMessage([0])]),
+              StubEvent(blpapi.Event.PARTIAL_RESPONSE, [response]),
+              StubEvent(blpapi.Event.RESPONSE, [response])]
+    con = stub_con(events)
+    msgs = list(con._receive_events([1], to_dict=False))
+    assert msgs == [response, response]
+    assert con._session.events == []
+
+
+def test_receive_events_errors():
+    con = stub_con([StubEvent(blpapi.Event.SESSION_STATUS,
+                              [StubMessage([])])])
+    with pytest.raises(RuntimeError, match='Timeout'):
+        list(con._receive_events([1], to_dict=False))
+
+    con = stub_con([StubEvent(blpapi.Event.REQUEST_STATUS,
+                              [StubMessage([1])])])
+    with pytest.raises(RuntimeError, match='Unexpected Event Type'):
+        list(con._receive_events([1], to_dict=False))
+
+
 @ifbbg
 def test_bdh_one_ticker_one_field_longdata(con):
     df = con.bdh('SPY US Equity', 'PX_LAST', '20150629', '20150630',
@@ -450,6 +535,30 @@ def test_context_manager_passed_session(port, host):
         pass
 
 
+@ifbbg
+def test_context_manager_reuse(port, host):
+    with pdblp.bopen(reuse=True, host=host, port=port) as bb1:
+        bb1.ref('AUD Curncy', 'NAME')
+    with pdblp.bopen(reuse=True, host=host, port=port) as bb2:
+        bb2.ref('AUD Curncy', 'NAME')
+    assert bb1 is bb2
+    pdblp.close_all()
+    with pdblp.bopen(reuse=True, host=host, port=port) as bb3:
+        pass
+    assert bb3 is not bb1
+    bb3.stop()
+    with pdblp.bopen(reuse=True, host=host, port=port) as bb4:
+        pass
+    assert bb4 is not bb3
+    pdblp.close_all()
+
+
+def test_context_manager_reuse_unhashable():
+    with pytest.raises(ValueError):
+        with pdblp.bopen(reuse=True, port=[8194]):
+            pass
+
+
 @ifbbg
 def test_multi_start(port, host, timeout):
     con = pdblp.BCon(host=host, port=port, timeout=timeout)